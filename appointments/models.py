@@ -1,6 +1,6 @@
 import uuid
-from datetime import datetime
-from sqlalchemy import String, Integer, Text, ForeignKey, DateTime, BigInteger
+from datetime import date, datetime
+from sqlalchemy import String, Integer, Text, ForeignKey, DateTime, BigInteger, Index, Date
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -8,13 +8,19 @@ from db import Base
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    # Monthly range partitions on start_datetime, managed by appointments/partitions.py.
+    # Postgres requires the partition key in the primary key.
+    __table_args__ = (
+        Index("ix_appointments_tutor_id_start_datetime", "tutor_id", "start_datetime"),
+        {"postgresql_partition_by": "RANGE (start_datetime)"},
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     tutor_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tutor_profiles.user_id"), nullable=False)
     client_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("users.id"), nullable=True)
     guest_details: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     
-    start_datetime: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    start_datetime: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
     end_datetime: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     
     status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)
@@ -23,3 +29,20 @@ class Appointment(Base):
 
     tutor = relationship("TutorProfile", backref="appointments")
     client = relationship("User", backref="appointments")
+
+
+class TutorDailyStats(Base):
+    """Per-tutor, per-local-day utilization rollup, maintained by appointments/rollups.py."""
+    __tablename__ = "tutor_daily_stats"
+
+    tutor_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tutor_profiles.user_id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    available_minutes: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    booked_minutes: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+
+    requested_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    pending_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    confirmed_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    declined_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    cancelled_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
@@ -0,0 +1,224 @@
+"""Monthly range partitions for the appointments table.
+
+Run ``python -m appointments.partitions`` periodically (e.g. a daily cron) to
+create upcoming partitions and archive old ones. Databases whose appointments
+table predates partitioning are converted once with
+``python -m appointments.partitions convert``.
+"""
+import argparse
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from core.config import settings
+from appointments.models import Appointment
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "appointments"
+DEFAULT_PARTITION = "appointments_default"
+ARCHIVE_SCHEMA = "appointments_archive"
+LEGACY_TABLE = "appointments_legacy"
+
+# pg_advisory_xact_lock key serializing partition maintenance across workers and the cron job
+MAINTENANCE_LOCK_KEY = 7_220_615_001
+
+_PARTITION_NAME = re.compile(r"^appointments_(\d{4})_(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month() -> date:
+    today = datetime.now(timezone.utc).date()
+    return today.replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    return f"appointments_{month:%Y_%m}"
+
+
+def _bound(month: date) -> str:
+    # Partition bounds are UTC month boundaries
+    return f"{month:%Y-%m-%d} 00:00:00+00"
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    result = await conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name AND relnamespace = 'public'::regnamespace"),
+        {"name": PARENT_TABLE},
+    )
+    return result.scalar_one_or_none() == "p"
+
+
+async def lock_maintenance(conn: AsyncConnection) -> None:
+    # Held until the caller's transaction ends; read partition state only after this
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+
+
+async def list_partitions(conn: AsyncConnection) -> set[str]:
+    result = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :name"
+        ),
+        {"name": PARENT_TABLE},
+    )
+    return set(result.scalars().all())
+
+
+async def ensure_partitions(
+    conn: AsyncConnection,
+    months_ahead: int = settings.APPOINTMENT_PARTITION_MONTHS_AHEAD,
+    first_month: date | None = None,
+) -> None:
+    if not await is_partitioned(conn):
+        # Tables created before partitioning was introduced need a one-off conversion
+        logger.warning(
+            "Table %s is not partitioned; run `python -m appointments.partitions convert`", PARENT_TABLE
+        )
+        return
+
+    await lock_maintenance(conn)
+    await conn.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT")
+    )
+    existing = await list_partitions(conn)
+
+    start = min(first_month or current_month(), current_month())
+    last = add_months(current_month(), months_ahead)
+    month = add_months(start, -1)
+    while month < last:
+        month = add_months(month, 1)
+        name = partition_name(month)
+        if name in existing:
+            continue
+
+        lower, upper = _bound(month), _bound(add_months(month, 1))
+        # Rows for this month may already sit in the default partition; move them
+        # over before attaching, otherwise the attach fails its range check.
+        await conn.execute(
+            text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        )
+        await conn.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE start_datetime >= '{lower}' AND start_datetime < '{upper}' RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            )
+        )
+        await conn.execute(
+            text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+        )
+        logger.info("Created partition %s", name)
+
+
+async def archive_partitions(
+    conn: AsyncConnection,
+    retention_months: int = settings.APPOINTMENT_RETENTION_MONTHS,
+) -> list[str]:
+    """Detach monthly partitions older than the retention window.
+
+    Detached partitions are moved to the ``appointments_archive`` schema so the
+    data stays queryable while leaving the hot table and its indexes small.
+    """
+    if not await is_partitioned(conn):
+        logger.warning("Table %s is not partitioned; skipping archival", PARENT_TABLE)
+        return []
+
+    await lock_maintenance(conn)
+    cutoff = add_months(current_month(), -retention_months)
+    await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+
+    archived = []
+    for name in sorted(await list_partitions(conn)):
+        match = _PARTITION_NAME.match(name)
+        if not match:
+            continue
+        month = date(int(match.group(1)), int(match.group(2)), 1)
+        if add_months(month, 1) > cutoff:
+            continue
+
+        await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        await conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        archived.append(name)
+        logger.info("Archived partition %s", name)
+
+    return archived
+
+
+async def convert_to_partitioned(conn: AsyncConnection) -> bool:
+    """One-off conversion of an unpartitioned appointments table.
+
+    Renames the existing table to ``appointments_legacy``, creates the
+    partitioned table from the model (monthly partitions back to the oldest
+    row), copies every row and moves the id sequence past the highest id. The
+    legacy table is kept for verification; drop it by hand afterwards. Runs in
+    the caller's transaction, so any failure leaves the original untouched.
+    Writers are blocked while it runs.
+    """
+    await lock_maintenance(conn)
+    result = await conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name AND relnamespace = 'public'::regnamespace"),
+        {"name": PARENT_TABLE},
+    )
+    relkind = result.scalar_one_or_none()
+    if relkind != "r":
+        logger.info("Table %s is %s; nothing to convert", PARENT_TABLE, "missing" if relkind is None else "already partitioned")
+        return False
+
+    await conn.execute(text(f"LOCK TABLE {PARENT_TABLE} IN ACCESS EXCLUSIVE MODE"))
+    # Free the names the new table's primary key and id sequence will use
+    await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_TABLE}"))
+    await conn.execute(text(f"ALTER TABLE {LEGACY_TABLE} RENAME CONSTRAINT {PARENT_TABLE}_pkey TO {LEGACY_TABLE}_pkey"))
+    await conn.execute(text(f"ALTER SEQUENCE {PARENT_TABLE}_id_seq RENAME TO {LEGACY_TABLE}_id_seq"))
+
+    await conn.run_sync(lambda sync_conn: Appointment.__table__.create(sync_conn))
+
+    oldest = (await conn.execute(text(f"SELECT min(start_datetime) FROM {LEGACY_TABLE}"))).scalar()
+    first_month = oldest.astimezone(timezone.utc).date().replace(day=1) if oldest else None
+    await ensure_partitions(conn, first_month=first_month)
+
+    columns = ", ".join(column.name for column in Appointment.__table__.columns)
+    await conn.execute(
+        text(f"INSERT INTO {PARENT_TABLE} ({columns}) SELECT {columns} FROM {LEGACY_TABLE}")
+    )
+    await conn.execute(
+        text(
+            f"SELECT setval(pg_get_serial_sequence('{PARENT_TABLE}', 'id'), "
+            f"(SELECT coalesce(max(id), 0) + 1 FROM {PARENT_TABLE}), false)"
+        )
+    )
+    logger.info("Converted %s to a partitioned table; old rows remain in %s", PARENT_TABLE, LEGACY_TABLE)
+    return True
+
+
+async def main(command: str):
+    from db import engine
+
+    async with engine.begin() as conn:
+        if command == "convert":
+            await convert_to_partitioned(conn)
+        else:
+            await ensure_partitions(conn)
+            await archive_partitions(conn)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "command", nargs="?", default="maintain", choices=["maintain", "convert"],
+        help="maintain: create upcoming and archive old partitions (default); "
+             "convert: one-off conversion of an unpartitioned table",
+    )
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args().command))
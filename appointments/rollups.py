@@ -0,0 +1,210 @@
+"""Daily per-tutor utilization rollups.
+
+Request handlers apply small deltas to ``tutor_daily_stats`` in the same
+transaction as the appointment change. Run ``python -m appointments.rollups``
+periodically (e.g. nightly) to rebuild recent days from the source tables and
+repair any drift.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select, delete, func, cast, and_, text, Date, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from appointments.models import Appointment, TutorDailyStats
+from tutors.models import TutorProfile
+from tutors.slots import get_weekly_template, day_of_week
+
+logger = logging.getLogger(__name__)
+
+STATUS_COUNTERS = {
+    "pending": "pending_count",
+    "confirmed": "confirmed_count",
+    "declined": "declined_count",
+    "cancelled": "cancelled_count",
+}
+COUNTERS = ["booked_minutes", "requested_count", *STATUS_COUNTERS.values()]
+
+RECONCILE_DAYS_BACK = 35
+RECONCILE_DAYS_AHEAD = 90
+
+
+def _minutes(appointment: Appointment) -> int:
+    return int((appointment.end_datetime - appointment.start_datetime).total_seconds() // 60)
+
+
+async def record_appointment_changes(
+    session: AsyncSession,
+    tutor: TutorProfile,
+    appointments: Iterable[Appointment],
+    old_status: str | None = None,
+) -> None:
+    """Apply rollup deltas for new appointments (old_status=None) or a status change.
+
+    Must run before the caller commits so the rollup moves with the appointment.
+    """
+    tutor_tz = ZoneInfo(tutor.timezone)
+    deltas: dict[date, dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    for appointment in appointments:
+        if appointment.status == old_status:
+            continue
+        delta = deltas[appointment.start_datetime.astimezone(tutor_tz).date()]
+        minutes = _minutes(appointment)
+
+        if old_status is None:
+            delta["requested_count"] += 1
+        else:
+            delta[STATUS_COUNTERS[old_status]] -= 1
+            if old_status == "confirmed":
+                delta["booked_minutes"] -= minutes
+
+        delta[STATUS_COUNTERS[appointment.status]] += 1
+        if appointment.status == "confirmed":
+            delta["booked_minutes"] += minutes
+
+    if not deltas:
+        return
+
+    # First touch of a day also seeds its available minutes from the compiled template
+    template = await get_weekly_template(tutor, session)
+    rows = [
+        {
+            "tutor_id": tutor.user_id,
+            "day": day,
+            "available_minutes": template.available_minutes(day_of_week(day)),
+            **delta,
+        }
+        for day, delta in deltas.items()
+    ]
+    statement = pg_insert(TutorDailyStats).values(rows)
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[TutorDailyStats.tutor_id, TutorDailyStats.day],
+            set_={
+                counter: getattr(TutorDailyStats, counter) + getattr(statement.excluded, counter)
+                for counter in COUNTERS
+            },
+        )
+    )
+
+
+async def reconcile_rollups(session: AsyncSession, start_day: date, end_day: date) -> int:
+    """Rebuild rollup rows for [start_day, end_day] from appointments and patterns.
+
+    Counters are always recomputed. available_minutes is refreshed from the
+    current templates only for today onwards; past days keep their stored value
+    so pattern edits don't rewrite history.
+
+    Takes a SHARE ROW EXCLUSIVE lock on the rollup table for the rest of the
+    caller's transaction. Incremental writers upsert before committing, so each
+    one either committed before the aggregate below runs (and is counted) or
+    waits and applies its delta on top of the rebuilt rows.
+    """
+    today = datetime.now(timezone.utc).date()
+
+    # Compile templates before locking so bookings aren't blocked on N pattern queries
+    tutors = (await session.execute(select(TutorProfile))).scalars().all()
+    templates = {tutor.user_id: await get_weekly_template(tutor, session) for tutor in tutors}
+
+    await session.execute(text(f"LOCK TABLE {TutorDailyStats.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+
+    rows: dict[tuple, dict] = {}
+
+    def row_for(tutor_id, day) -> dict:
+        return rows.setdefault(
+            (tutor_id, day),
+            {"tutor_id": tutor_id, "day": day, "available_minutes": 0, **dict.fromkeys(COUNTERS, 0)},
+        )
+
+    stored = await session.execute(
+        select(TutorDailyStats.tutor_id, TutorDailyStats.day, TutorDailyStats.available_minutes).where(
+            TutorDailyStats.day >= start_day,
+            TutorDailyStats.day <= end_day,
+            TutorDailyStats.day < today,
+        )
+    )
+    for tutor_id, day, available in stored.all():
+        row_for(tutor_id, day)["available_minutes"] = available
+
+    local_day = cast(func.timezone(TutorProfile.timezone, Appointment.start_datetime), Date)
+    minutes = cast(func.floor(func.extract("epoch", Appointment.end_datetime - Appointment.start_datetime) / 60), Integer)
+
+    def count_status(status: str):
+        return func.count().filter(Appointment.status == status)
+
+    aggregates = await session.execute(
+        select(
+            Appointment.tutor_id,
+            local_day,
+            func.coalesce(func.sum(minutes).filter(Appointment.status == "confirmed"), 0),
+            func.count(),
+            *(count_status(status) for status in STATUS_COUNTERS),
+        )
+        .join(TutorProfile, TutorProfile.user_id == Appointment.tutor_id)
+        .where(
+            # Widened UTC bounds for partition pruning; local_day does the exact cut
+            Appointment.start_datetime >= datetime.combine(start_day - timedelta(days=1), time.min, tzinfo=timezone.utc),
+            Appointment.start_datetime < datetime.combine(end_day + timedelta(days=2), time.min, tzinfo=timezone.utc),
+            local_day.between(start_day, end_day),
+        )
+        .group_by(Appointment.tutor_id, local_day)
+    )
+    for tutor_id, day, booked, requested, *status_counts in aggregates.all():
+        row_for(tutor_id, day).update(
+            booked_minutes=booked,
+            requested_count=requested,
+            **dict(zip(STATUS_COUNTERS.values(), status_counts)),
+        )
+
+    for tutor_id, template in templates.items():
+        day = max(start_day, today)
+        while day <= end_day:
+            available = template.available_minutes(day_of_week(day))
+            if available or (tutor_id, day) in rows:
+                row_for(tutor_id, day)["available_minutes"] = available
+            day += timedelta(days=1)
+
+    await session.execute(
+        delete(TutorDailyStats).where(
+            and_(TutorDailyStats.day >= start_day, TutorDailyStats.day <= end_day)
+        )
+    )
+    if rows:
+        statement = pg_insert(TutorDailyStats)
+        await session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[TutorDailyStats.tutor_id, TutorDailyStats.day],
+                set_={
+                    column: getattr(statement.excluded, column)
+                    for column in ["available_minutes", *COUNTERS]
+                },
+            ),
+            list(rows.values()),
+        )
+    return len(rows)
+
+
+async def main():
+    from db import engine, async_session_maker
+
+    today = datetime.now(timezone.utc).date()
+    async with async_session_maker() as session:
+        count = await reconcile_rollups(
+            session,
+            today - timedelta(days=RECONCILE_DAYS_BACK),
+            today + timedelta(days=RECONCILE_DAYS_AHEAD),
+        )
+        await session.commit()
+    logger.info("Reconciled %d tutor_daily_stats rows", count)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,10 +1,11 @@
 import uuid
-from typing import List, Optional
-from datetime import datetime, time
+from typing import List, Literal, Optional
+from datetime import date, datetime, time, timedelta, UTC
+from zoneinfo import ZoneInfo
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_, func, cast, Time
+from sqlalchemy import select, insert, values, column, or_, and_, func, cast, Time, Integer, DateTime, Date
 
 from db import get_async_session
 from users.models import User
@@ -12,9 +13,16 @@ from users.manager import get_user_manager
 from users.auth import auth_backend
 from fastapi_users import FastAPIUsers
 
-from appointments.models import Appointment
-from appointments.schemas import AppointmentCreate, AppointmentRead, AppointmentUpdateStatus
+from appointments.models import Appointment, TutorDailyStats
+from appointments.rollups import record_appointment_changes, COUNTERS
+from appointments.schemas import (
+    AppointmentCreate, AppointmentRead, AppointmentUpdateStatus, MAX_APPOINTMENT_DURATION,
+    AppointmentSeriesCreate, AppointmentSeriesRead, SeriesConflict, MAX_SERIES_OCCURRENCES,
+    UtilizationRead
+)
 from tutors.models import TutorProfile
+from tutors.slots import local_instants, add_elapsed
+from tutors.events import publish_appointment_change
 
 router = APIRouter()
 
@@ -43,7 +51,8 @@ async def create_appointment(
     tutor_result = await session.execute(
         select(TutorProfile).where(TutorProfile.user_id == appointment_data.tutor_id)
     )
-    if not tutor_result.scalar_one_or_none():
+    tutor = tutor_result.scalar_one_or_none()
+    if not tutor:
         raise HTTPException(status_code=404, detail="Tutor not found")
 
     # Check for overlaps
@@ -52,7 +61,9 @@ async def create_appointment(
         Appointment.tutor_id == appointment_data.tutor_id,
         Appointment.status.in_(['pending', 'confirmed']),
         Appointment.start_datetime < appointment_data.end_datetime,
-        Appointment.end_datetime > appointment_data.start_datetime
+        Appointment.end_datetime > appointment_data.start_datetime,
+        # Redundant given the max duration, but lets Postgres prune partitions
+        Appointment.start_datetime > appointment_data.start_datetime - MAX_APPOINTMENT_DURATION
     )
     result = await session.execute(overlap_query)
     if result.scalar_one_or_none():
@@ -77,11 +88,191 @@ async def create_appointment(
 
     new_appointment = Appointment(**data)
     session.add(new_appointment)
+    await session.flush()
+    await record_appointment_changes(session, tutor, [new_appointment])
     await session.commit()
     await session.refresh(new_appointment)
+    await publish_appointment_change(new_appointment)
     
     return new_appointment
 
+def expand_series(
+    series_data: AppointmentSeriesCreate, tutor_tz: ZoneInfo
+) -> list[tuple[datetime, datetime, bool]]:
+    """Occurrences as (start, end, exists).
+
+    Starts step in local wall-clock time, so a 16:00 weekly session stays at
+    16:00 across DST changes; ends add the duration in real time. The first
+    occurrence is the client's instant as sent. A later start that falls in a
+    spring-forward gap doesn't exist and comes back with exists=False; one in a
+    repeated fall-back hour uses the same fold as the first occurrence.
+    """
+    rule = series_data.recurrence
+    step = timedelta(days=rule.interval * (1 if rule.frequency == "daily" else 7))
+    first_start = series_data.start_datetime
+    # A naive start has no instant of its own; it resolves like any later wall time
+    client_instant = first_start.astimezone(tutor_tz) if first_start.tzinfo else None
+    first_start = client_instant or first_start.replace(tzinfo=tutor_tz)
+    first_wall = first_start.replace(tzinfo=None)
+    duration = series_data.end_datetime - series_data.start_datetime
+    until = rule.until
+    if until is not None and until.tzinfo is None:
+        until = until.replace(tzinfo=tutor_tz)
+
+    occurrences = []
+    while True:
+        if rule.count is not None and len(occurrences) >= rule.count:
+            break
+        wall = first_wall + step * len(occurrences)
+        if not occurrences and client_instant is not None:
+            # The first occurrence is exactly the instant the client sent
+            instants = [client_instant]
+        else:
+            # In a repeated hour, keep the same side of the transition as the first occurrence
+            instants = sorted(
+                local_instants(wall, tutor_tz),
+                key=lambda instant: instant.fold != first_start.fold,
+            )
+        start = instants[0] if instants else wall.replace(tzinfo=tutor_tz)
+        # Compare in UTC: same-tzinfo comparisons ignore fold
+        if until is not None and start.astimezone(UTC) > until:
+            break
+        if len(occurrences) >= MAX_SERIES_OCCURRENCES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"A series cannot have more than {MAX_SERIES_OCCURRENCES} occurrences"
+            )
+        occurrences.append((start, add_elapsed(start, duration), bool(instants)))
+
+    if not occurrences:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Recurrence produces no occurrences"
+        )
+    return occurrences
+
+
+@router.post("/series", response_model=AppointmentSeriesRead)
+async def create_appointment_series(
+    series_data: AppointmentSeriesCreate,
+    user: Optional[User] = Depends(optional_current_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    if not user and not series_data.guest_details:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Guest details required for unauthenticated users"
+        )
+
+    tutor_result = await session.execute(
+        select(TutorProfile).where(TutorProfile.user_id == series_data.tutor_id)
+    )
+    tutor = tutor_result.scalar_one_or_none()
+    if not tutor:
+        raise HTTPException(status_code=404, detail="Tutor not found")
+
+    occurrences = expand_series(series_data, ZoneInfo(tutor.timezone))
+
+    conflicts = [
+        SeriesConflict(
+            occurrence=index,
+            start_datetime=start,
+            end_datetime=end,
+            reason="nonexistent_time",
+        )
+        for index, (start, end, exists) in enumerate(occurrences)
+        if not exists
+    ]
+    bookable = [
+        (index, start, end)
+        for index, (start, end, exists) in enumerate(occurrences)
+        if exists
+    ]
+
+    if bookable:
+        # Check every occurrence for overlaps in one query by joining against a VALUES list
+        occurrence_rows = values(
+            column("occurrence", Integer),
+            column("start_datetime", DateTime(timezone=True)),
+            column("end_datetime", DateTime(timezone=True)),
+            name="occurrences",
+        ).data(bookable)
+
+        conflict_query = (
+            select(occurrence_rows.c.occurrence, Appointment.id)
+            .join(
+                Appointment,
+                and_(
+                    Appointment.start_datetime < occurrence_rows.c.end_datetime,
+                    Appointment.end_datetime > occurrence_rows.c.start_datetime,
+                ),
+            )
+            .where(
+                Appointment.tutor_id == series_data.tutor_id,
+                Appointment.status.in_(['pending', 'confirmed']),
+                # Bound the whole series so Postgres can prune partitions
+                Appointment.start_datetime > bookable[0][1] - MAX_APPOINTMENT_DURATION,
+                Appointment.start_datetime < bookable[-1][2],
+            )
+            .order_by(occurrence_rows.c.occurrence, Appointment.start_datetime)
+        )
+        conflicting_ids: dict[int, int] = {}
+        for index, appointment_id in (await session.execute(conflict_query)).all():
+            conflicting_ids.setdefault(index, appointment_id)
+
+        conflicts.extend(
+            SeriesConflict(
+                occurrence=index,
+                start_datetime=occurrences[index][0],
+                end_datetime=occurrences[index][1],
+                reason="booked",
+                conflicting_appointment_id=appointment_id,
+            )
+            for index, appointment_id in conflicting_ids.items()
+        )
+        conflicts.sort(key=lambda conflict: conflict.occurrence)
+
+    if conflicts and not series_data.skip_conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Some occurrences cannot be booked",
+                "conflicts": [conflict.model_dump(mode="json") for conflict in conflicts],
+            }
+        )
+
+    # Same client/guest rules as a single booking
+    data = series_data.model_dump(exclude={"recurrence", "skip_conflicts", "start_datetime", "end_datetime"})
+    if user:
+        data['client_id'] = user.id
+        data['guest_details'] = None
+    else:
+        data['client_id'] = None
+
+    skipped = {conflict.occurrence for conflict in conflicts}
+    rows = [
+        {**data, "start_datetime": start, "end_datetime": end}
+        for index, start, end in bookable
+        if index not in skipped
+    ]
+
+    created = []
+    if rows:
+        # One multi-row INSERT ... RETURNING in the same transaction as the check
+        result = await session.scalars(
+            insert(Appointment).returning(Appointment, sort_by_parameter_order=True), rows
+        )
+        created = result.all()
+        await record_appointment_changes(session, tutor, created)
+        await session.commit()
+        for appointment in created:
+            await publish_appointment_change(appointment)
+
+    return AppointmentSeriesRead(
+        created=[AppointmentRead.model_validate(appointment) for appointment in created],
+        conflicts=conflicts,
+    )
+
 @router.get("/me", response_model=List[AppointmentRead])
 async def get_my_appointments(
     day_of_week: Optional[int] = None,
@@ -91,19 +282,23 @@ async def get_my_appointments(
     session: AsyncSession = Depends(get_async_session)
 ):
     # Return appointments where user is client OR user is tutor
-    query = select(Appointment).where(
-        or_(
-            Appointment.client_id == user.id,
-            Appointment.tutor_id == user.id
+    query = (
+        select(Appointment)
+        .join(TutorProfile, TutorProfile.user_id == Appointment.tutor_id)
+        .where(
+            or_(
+                Appointment.client_id == user.id,
+                Appointment.tutor_id == user.id
+            )
         )
     )
 
     # Timezone conversion for correct DOW/Time filtering
     # Postgres stores timestamptz. usage of AT TIME ZONE converts to timestamp (no tz) in that zone.
-    # We assume 'America/Guayaquil' as per project specs.
+    # Filters are interpreted in the tutor's own time zone.
     
-    local_dt = func.timezone('America/Guayaquil', Appointment.start_datetime)
-    local_end_dt = func.timezone('America/Guayaquil', Appointment.end_datetime)
+    local_dt = func.timezone(TutorProfile.timezone, Appointment.start_datetime)
+    local_end_dt = func.timezone(TutorProfile.timezone, Appointment.end_datetime)
 
     if day_of_week is not None:
         # Postgres DOW: 0=Sunday, 6=Saturday
@@ -120,6 +315,61 @@ async def get_my_appointments(
     result = await session.execute(query)
     return result.scalars().all()
 
+@router.get("/analytics", response_model=List[UtilizationRead])
+async def get_utilization(
+    start: date,
+    end: date,
+    granularity: Literal["day", "week"] = "week",
+    tutor_id: Optional[uuid.UUID] = None,
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    # Tutors see their own numbers; superusers can look at any tutor.
+    # (role "admin" is self-assignable via /users/me, so it grants nothing here)
+    if user.is_superuser:
+        if tutor_id is None:
+            raise HTTPException(status_code=400, detail="tutor_id is required for superusers")
+    elif user.role == "tutor":
+        if tutor_id not in (None, user.id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Tutors can only view their own analytics"
+            )
+        tutor_id = user.id
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only tutors and superusers can view analytics"
+        )
+
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days > 366:
+        raise HTTPException(status_code=400, detail="Range cannot exceed one year")
+
+    # Served from the daily rollup, so cost scales with days, not appointments
+    if granularity == "day":
+        period = TutorDailyStats.day
+    else:
+        period = cast(func.date_trunc('week', TutorDailyStats.day), Date)
+
+    query = (
+        select(
+            period.label("period_start"),
+            func.sum(TutorDailyStats.available_minutes).label("available_minutes"),
+            *(func.sum(getattr(TutorDailyStats, counter)).label(counter) for counter in COUNTERS),
+        )
+        .where(
+            TutorDailyStats.tutor_id == tutor_id,
+            TutorDailyStats.day >= start,
+            TutorDailyStats.day <= end,
+        )
+        .group_by(period)
+        .order_by(period)
+    )
+    result = await session.execute(query)
+    return [UtilizationRead.from_totals(**row) for row in result.mappings().all()]
+
 @router.patch("/{appointment_id}/status", response_model=AppointmentRead)
 async def update_appointment_status(
     appointment_id: int,
@@ -127,8 +377,14 @@ async def update_appointment_status(
     user: User = Depends(current_active_user),
     session: AsyncSession = Depends(get_async_session)
 ):
-    # Fetch appointment
-    result = await session.execute(select(Appointment).where(Appointment.id == appointment_id))
+    # Fetch appointment, locked so concurrent status changes serialize and the
+    # rollup delta below is computed from the committed old status
+    result = await session.execute(
+        select(Appointment)
+        .where(Appointment.id == appointment_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
     appointment = result.scalar_one_or_none()
     
     if not appointment:
@@ -142,7 +398,14 @@ async def update_appointment_status(
             detail="Only the designated tutor can update the status of this appointment"
         )
 
+    old_status = appointment.status
     appointment.status = status_update.status
+
+    tutor_result = await session.execute(
+        select(TutorProfile).where(TutorProfile.user_id == appointment.tutor_id)
+    )
+    await record_appointment_changes(session, tutor_result.scalar_one(), [appointment], old_status)
     await session.commit()
     await session.refresh(appointment)
+    await publish_appointment_change(appointment)
     return appointment
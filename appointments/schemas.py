@@ -1,6 +1,12 @@
 import uuid
-from pydantic import BaseModel, Field, ConfigDict, field_validator, EmailStr
-from datetime import datetime
+from typing import Literal
+from pydantic import BaseModel, Field, ConfigDict, field_validator, model_validator, EmailStr
+from datetime import date, datetime, timedelta
+
+# Upper bound on a single booking. Lets overlap checks put a lower bound on
+# start_datetime so Postgres can prune to the relevant monthly partitions.
+MAX_APPOINTMENT_DURATION = timedelta(hours=24)
+MAX_SERIES_OCCURRENCES = 52
 
 class GuestDetails(BaseModel):
     name: str
@@ -21,6 +27,12 @@ class AppointmentBase(BaseModel):
 class AppointmentCreate(AppointmentBase):
     guest_details: GuestDetails | None = None
 
+    @field_validator('end_datetime')
+    def check_max_duration(cls, v, values):
+        if 'start_datetime' in values.data and v - values.data['start_datetime'] > MAX_APPOINTMENT_DURATION:
+            raise ValueError('appointments cannot be longer than 24 hours')
+        return v
+
 class AppointmentRead(AppointmentBase):
     id: int
     client_id: uuid.UUID | None = None
@@ -32,3 +44,58 @@ class AppointmentRead(AppointmentBase):
 
 class AppointmentUpdateStatus(BaseModel):
     status: str = Field(..., pattern="^(pending|confirmed|declined|cancelled)$")
+
+class RecurrenceRule(BaseModel):
+    frequency: Literal["daily", "weekly"] = "weekly"
+    interval: int = Field(1, ge=1, le=52)
+    count: int | None = Field(None, ge=1, le=MAX_SERIES_OCCURRENCES)
+    until: datetime | None = None
+
+    @model_validator(mode='after')
+    def check_count_or_until(self):
+        if (self.count is None) == (self.until is None):
+            raise ValueError('exactly one of count or until is required')
+        return self
+
+class AppointmentSeriesCreate(AppointmentCreate):
+    """First occurrence plus a recurrence rule, expanded in the tutor's time zone."""
+    recurrence: RecurrenceRule
+    skip_conflicts: bool = False
+
+class SeriesConflict(BaseModel):
+    occurrence: int
+    start_datetime: datetime
+    end_datetime: datetime
+    # "booked": overlaps conflicting_appointment_id; "nonexistent_time": the
+    # local start falls in a DST gap in the tutor's time zone
+    reason: Literal["booked", "nonexistent_time"]
+    conflicting_appointment_id: int | None = None
+
+class AppointmentSeriesRead(BaseModel):
+    created: list[AppointmentRead]
+    conflicts: list[SeriesConflict]
+
+class UtilizationRead(BaseModel):
+    period_start: date
+    available_minutes: int
+    booked_minutes: int
+    utilization: float | None = None
+    requested_count: int
+    pending_count: int
+    confirmed_count: int
+    declined_count: int
+    cancelled_count: int
+    confirm_rate: float | None = None
+    decline_rate: float | None = None
+
+    @classmethod
+    def from_totals(cls, **totals):
+        # Ratios are left empty rather than zero when there's nothing to divide by
+        available = totals["available_minutes"]
+        requested = totals["requested_count"]
+        return cls(
+            **totals,
+            utilization=totals["booked_minutes"] / available if available else None,
+            confirm_rate=totals["confirmed_count"] / requested if requested else None,
+            decline_rate=totals["declined_count"] / requested if requested else None,
+        )
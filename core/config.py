@@ -1,8 +1,22 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     SECRET_KEY: str
+
+    # Slow-query instrumentation (opt-in)
+    SLOW_QUERY_LOG_ENABLED: bool = False
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.1
+    SLOW_QUERY_BUFFER_SIZE: int = 50
+
+    # Appointment partitioning / archival
+    APPOINTMENT_PARTITION_MONTHS_AHEAD: int = 3
+    APPOINTMENT_RETENTION_MONTHS: int = 12
+
+    # Live availability stream fan-out: "memory" (single worker) or "postgres"
+    AVAILABILITY_BROKER: Literal["memory", "postgres"] = "memory"
     
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.config import settings
+
+logger = logging.getLogger("slow_queries")
+
+# Set per request by the HTTP middleware in main.py so queries can be attributed
+current_route: ContextVar[str | None] = ContextVar("current_route", default=None)
+
+# Most recent sampled offenders, newest last. Bounded so memory stays flat.
+slow_query_buffer: deque[dict] = deque(maxlen=settings.SLOW_QUERY_BUFFER_SIZE)
+
+# At most this many EXPLAIN replays in flight, so they can't drain the pool
+MAX_PENDING_EXPLAINS = 1
+_pending_explains: set[asyncio.Task] = set()
+
+# True inside a replay so its own statements are not timed or re-sampled
+_explaining: ContextVar[bool] = ContextVar("explaining", default=False)
+
+_engine: AsyncEngine | None = None
+
+
+def redact_parameters(parameters):
+    # Never log literal values (emails, guest details, notes); keep only their shape
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: redact_parameters(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact_parameters(value) for value in parameters]
+    return f"<{type(parameters).__name__}>"
+
+
+def _is_explainable(statement: str) -> bool:
+    # EXPLAIN ANALYZE executes the statement, so only plain reads are safe to replay
+    normalized = statement.lstrip().upper()
+    if not normalized.startswith("SELECT"):
+        return False
+    return "FOR UPDATE" not in normalized and "FOR SHARE" not in normalized
+
+
+async def _capture_plan(entry: dict, statement: str, parameters) -> None:
+    # Runs as a background task on its own pooled connection, so neither a
+    # failing EXPLAIN nor a pool timeout can reach the request that was slow.
+    token = _explaining.set(True)
+    try:
+        async with _engine.connect() as conn:
+            result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+            entry["plan"] = "\n".join(row[0] for row in result.all())
+            # Leaving the block rolls back whatever the replay touched
+    except Exception:
+        logger.exception("Failed to capture EXPLAIN for slow query")
+    finally:
+        _explaining.reset(token)
+    slow_query_buffer.append(entry)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    if duration_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    route = current_route.get()
+    redacted = redact_parameters(parameters)
+    logger.warning(
+        "Slow query (%.1f ms) on %s: %s | params=%s",
+        duration_ms, route or "<no route>", statement, redacted,
+    )
+
+    if _explaining.get() or executemany or not _is_explainable(statement):
+        return
+    if len(_pending_explains) >= MAX_PENDING_EXPLAINS:
+        return
+    if random.random() >= settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        return
+
+    entry = {
+        "captured_at": datetime.now(timezone.utc),
+        "route": route,
+        "statement": statement,
+        "parameters": redacted,
+        "duration_ms": round(duration_ms, 3),
+        "plan": None,
+    }
+    # Listeners run inside the event loop's thread (SQLAlchemy's greenlet
+    # bridge), so the replay can be handed off without blocking this request.
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    params = tuple(parameters) if isinstance(parameters, list) else parameters
+    task = loop.create_task(_capture_plan(entry, statement, params))
+    _pending_explains.add(task)
+    task.add_done_callback(_pending_explains.discard)
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not fire on errors; keep the timing stack balanced
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+def install_query_log(engine: AsyncEngine) -> None:
+    global _engine
+    _engine = engine
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
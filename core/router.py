@@ -0,0 +1,27 @@
+import uuid
+from fastapi import APIRouter, Depends
+from fastapi_users import FastAPIUsers
+
+from users.models import User
+from users.manager import get_user_manager
+from users.auth import auth_backend
+
+from core.query_log import slow_query_buffer
+from core.schemas import SlowQueryRead
+
+router = APIRouter()
+
+fastapi_users = FastAPIUsers[User, uuid.UUID](
+    get_user_manager,
+    [auth_backend],
+)
+
+# Admin access hinges on is_superuser, which users can't set on themselves:
+# the self-service role field accepts "admin" and must not grant anything.
+current_superuser = fastapi_users.current_user(active=True, superuser=True)
+
+
+@router.get("/slow-queries", response_model=list[SlowQueryRead])
+async def get_slow_queries(user: User = Depends(current_superuser)):
+    # Newest first; empty unless SLOW_QUERY_LOG_ENABLED is set
+    return list(reversed(slow_query_buffer))
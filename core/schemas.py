@@ -0,0 +1,12 @@
+from typing import Any
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class SlowQueryRead(BaseModel):
+    captured_at: datetime
+    route: str | None = None
+    statement: str
+    parameters: Any = None
+    duration_ms: float
+    plan: str | None = None
@@ -1,17 +1,34 @@
 import uuid
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Request
 from fastapi_users import FastAPIUsers
 
-from db import engine, Base
+from db import engine, Base, upgrade_schema
+from core.config import settings
+from core.query_log import current_route, install_query_log
+from core.router import router as admin_router
 from users.auth import auth_backend
 from users.manager import get_user_manager
 from users.models import User
 from users.schemas import UserRead, UserCreate, UserUpdate
 from tutors.router import router as tutors_router
+from tutors.events import broker as availability_broker
 from appointments.router import router as appointments_router
+from appointments.partitions import ensure_partitions, lock_maintenance
 
 app = FastAPI()
 
+if settings.SLOW_QUERY_LOG_ENABLED:
+    install_query_log(engine)
+
+    @app.middleware("http")
+    async def tag_queries_with_route(request: Request, call_next):
+        # Lets the slow-query log attribute statements to the request that ran them
+        token = current_route.set(f"{request.method} {request.url.path}")
+        try:
+            return await call_next(request)
+        finally:
+            current_route.reset(token)
+
 # Main API Router
 api_router = APIRouter(prefix="/api/v1")
 
@@ -53,6 +70,13 @@ api_router.include_router(
     tags=["appointments"]
 )
 
+# Admin Routes
+api_router.include_router(
+    admin_router,
+    prefix="/admin",
+    tags=["admin"]
+)
+
 # Mount the API router to the main app
 app.include_router(api_router)
 
@@ -61,7 +85,17 @@ app.include_router(api_router)
 async def on_startup():
     # Not needed if you setup a migration system like Alembic
     async with engine.begin() as conn:
+        # Workers start together; serialize schema setup so they don't race
+        await lock_maintenance(conn)
         await conn.run_sync(Base.metadata.create_all)
+        await upgrade_schema(conn)
+        await ensure_partitions(conn)
+    await availability_broker.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await availability_broker.stop()
 
 
 @app.get("/")
@@ -0,0 +1,158 @@
+"""Live availability change notifications for the SSE stream.
+
+Events are fanned out in-process to subscribed queues. With several workers,
+set ``AVAILABILITY_BROKER=postgres`` so events are relayed through Postgres
+LISTEN/NOTIFY and every worker sees changes made by the others.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from core.config import settings
+from appointments.models import Appointment
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "availability_events"
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class AvailabilityBroker(ABC):
+    def __init__(self):
+        self._subscribers: dict[uuid.UUID, set[asyncio.Queue]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, tutor_id: uuid.UUID, event: dict) -> None:
+        ...
+
+    def subscribe(self, tutor_id: uuid.UUID) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(tutor_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, tutor_id: uuid.UUID, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(tutor_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[tutor_id]
+
+    def dispatch(self, tutor_id: uuid.UUID, event: dict) -> None:
+        for queue in self._subscribers.get(tutor_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow consumer: drop the backlog and tell it to refetch instead
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+
+class InMemoryBroker(AvailabilityBroker):
+    async def publish(self, tutor_id: uuid.UUID, event: dict) -> None:
+        self.dispatch(tutor_id, event)
+
+
+class PostgresBroker(AvailabilityBroker):
+    def __init__(self, dsn: str):
+        super().__init__()
+        self._dsn = dsn
+        self._connection: asyncpg.Connection | None = None
+        self._lock = asyncio.Lock()
+        self._running = False
+        self._reconnect_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._running = True
+        self._connection = await asyncpg.connect(self._dsn)
+        await self._connection.add_listener(NOTIFY_CHANNEL, self._on_notify)
+        self._connection.add_termination_listener(self._on_terminated)
+
+    async def stop(self) -> None:
+        self._running = False
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
+
+    async def publish(self, tutor_id: uuid.UUID, event: dict) -> None:
+        payload = json.dumps({"tutor_id": str(tutor_id), "event": event})
+        try:
+            async with self._lock:
+                if self._connection is None:
+                    await self.start()
+                await self._connection.execute("SELECT pg_notify($1, $2)", NOTIFY_CHANNEL, payload)
+        except Exception:
+            # Live updates are best effort; never fail the write that triggered them
+            logger.exception("Failed to publish availability event")
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        message = json.loads(payload)
+        self.dispatch(uuid.UUID(message["tutor_id"]), message["event"])
+
+    def _on_terminated(self, connection) -> None:
+        if self._connection is connection:
+            logger.warning("Availability LISTEN connection lost; reconnecting")
+            self._connection = None
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 1
+        while self._running and self._connection is None:
+            try:
+                async with self._lock:
+                    if self._connection is None:
+                        await self.start()
+            except Exception:
+                logger.exception("Availability LISTEN reconnect failed")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+def create_broker() -> AvailabilityBroker:
+    if settings.AVAILABILITY_BROKER == "postgres":
+        url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+        return PostgresBroker(url.render_as_string(hide_password=False))
+    return InMemoryBroker()
+
+
+broker = create_broker()
+
+
+async def publish_appointment_change(appointment: Appointment) -> None:
+    # One booking's status doesn't decide a slot's availability (another booking
+    # may still cover it), so only say which range changed; clients refetch it.
+    await broker.publish(
+        appointment.tutor_id,
+        {
+            "type": "slots_changed",
+            "start_datetime": appointment.start_datetime.isoformat(),
+            "end_datetime": appointment.end_datetime.isoformat(),
+        },
+    )
+
+
+async def publish_schedule_change(tutor_id: uuid.UUID, days_of_week: set[int] | None = None) -> None:
+    # Pattern or profile edits reshape whole days; clients refetch the affected ones
+    await broker.publish(
+        tutor_id,
+        {
+            "type": "schedule_changed",
+            "days_of_week": sorted(days_of_week) if days_of_week is not None else None,
+        },
+    )
+
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import String, Integer, Text, ForeignKey, Time, Boolean, SmallInteger
+from sqlalchemy import String, Integer, Text, ForeignKey, Time, Boolean, SmallInteger, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from db import Base
@@ -12,6 +12,9 @@ class TutorProfile(Base):
     specialty: Mapped[str | None] = mapped_column(String(100), nullable=True)
     bio: Mapped[str | None] = mapped_column(Text, nullable=True)
     session_duration_minutes: Mapped[int] = mapped_column(Integer, default=60, nullable=False)
+    timezone: Mapped[str] = mapped_column(String(64), default="America/Guayaquil", server_default="America/Guayaquil", nullable=False)
+    # Bumped on every availability pattern change; keys the compiled weekly template cache
+    availability_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     user = relationship("User", backref="tutor_profile")
     availability_patterns = relationship("AvailabilityPattern", back_populates="tutor", cascade="all, delete-orphan")
@@ -19,6 +22,9 @@ class TutorProfile(Base):
 
 class AvailabilityPattern(Base):
     __tablename__ = "availability_patterns"
+    __table_args__ = (
+        Index("ix_availability_patterns_tutor_id_day_of_week", "tutor_id", "day_of_week"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tutor_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("tutor_profiles.user_id"), nullable=False)
@@ -1,10 +1,11 @@
+import asyncio
 import uuid
-from datetime import date, datetime, timedelta, time
+from datetime import date, datetime, time
 from zoneinfo import ZoneInfo
-from typing import cast
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, update, exists, func, cast, literal, Date, DateTime, Time
 
 from db import get_async_session
 from users.models import User
@@ -18,10 +19,15 @@ from tutors.schemas import (
     AvailabilityPatternCreate, AvailabilityPatternUpdate, AvailabilityPatternRead,
     SlotRead
 )
+from tutors.slots import get_weekly_template, expand_template
+from tutors.events import broker, format_sse, publish_schedule_change
 from appointments.models import Appointment
+from appointments.schemas import MAX_APPOINTMENT_DURATION
 
 router = APIRouter()
 
+STREAM_HEARTBEAT_SECONDS = 15
+
 fastapi_users = FastAPIUsers[User, uuid.UUID](
     get_user_manager,
     [auth_backend],
@@ -39,6 +45,15 @@ async def get_current_tutor(user: User = Depends(current_active_user)):
     return user
 
 
+async def bump_availability_version(tutor_id: uuid.UUID, session: AsyncSession):
+    # Invalidates the compiled weekly template for this tutor in every worker
+    await session.execute(
+        update(TutorProfile)
+        .where(TutorProfile.user_id == tutor_id)
+        .values(availability_version=TutorProfile.availability_version + 1)
+    )
+
+
 @router.post("/me", response_model=TutorProfileRead)
 async def create_my_profile(
     profile_data: TutorProfileCreate,
@@ -127,24 +142,20 @@ async def update_my_profile(
     await session.commit()
     await session.refresh(profile)
 
+    if "session_duration_minutes" in update_data or "timezone" in update_data:
+        await publish_schedule_change(user.id)
+
     response = TutorProfileRead.model_validate(profile)
     response.full_name = user.full_name
     return response
 
 
-GUAYAQUIL_TZ = ZoneInfo("America/Guayaquil")
-
-
 async def calculate_slots(
     tutor_id: uuid.UUID,
     target_date: date,
     session: AsyncSession,
 ) -> list[SlotRead]:
-    # 1. Get day of week (0=Sunday, 6=Saturday)
-    # Python: Mon=0, Sun=6.
-    day_of_week = (target_date.weekday() + 1) % 7
-
-    # 2. Get Tutor Profile
+    # 1. Get Tutor Profile
     tutor_query = select(TutorProfile).where(TutorProfile.user_id == tutor_id)
     tutor_result = await session.execute(tutor_query)
     tutor = tutor_result.scalar_one_or_none()
@@ -152,21 +163,14 @@ async def calculate_slots(
     if not tutor:
         raise HTTPException(status_code=404, detail="Tutor not found")
 
-    # 3. Get Availability Patterns
-    patterns_query = select(AvailabilityPattern).where(
-        and_(
-            AvailabilityPattern.tutor_id == tutor_id,
-            AvailabilityPattern.day_of_week == day_of_week,
-            AvailabilityPattern.is_active,
-        )
-    )
-    patterns_result = await session.execute(patterns_query)
-    patterns = patterns_result.scalars().all()
+    # 2. Get the compiled weekly template (only hits the patterns table when stale)
+    tutor_tz = ZoneInfo(tutor.timezone)
+    template = await get_weekly_template(tutor, session)
 
-    # 4. Get Appointments for that day
-    # Define the range for the requested date in Guayaquil time
-    start_of_day = datetime.combine(target_date, time.min, tzinfo=GUAYAQUIL_TZ)
-    end_of_day = datetime.combine(target_date, time.max, tzinfo=GUAYAQUIL_TZ)
+    # 3. Get Appointments for that day
+    # Define the range for the requested date in the tutor's local time
+    start_of_day = datetime.combine(target_date, time.min, tzinfo=tutor_tz)
+    end_of_day = datetime.combine(target_date, time.max, tzinfo=tutor_tz)
 
     appointments_query = select(Appointment).where(
         and_(
@@ -180,34 +184,25 @@ async def calculate_slots(
     appointments = appointments_result.scalars().all()
 
     slots = []
-    duration = timedelta(minutes=tutor.session_duration_minutes)
-
-    for pattern in patterns:
-        current_time = datetime.combine(target_date, cast(time, pattern.start_time), tzinfo=GUAYAQUIL_TZ)
-        pattern_end = datetime.combine(target_date, cast(time, pattern.end_time), tzinfo=GUAYAQUIL_TZ)
-
-        while current_time + duration <= pattern_end:
-            slot_start = current_time
-            slot_end = current_time + duration
-
-            # Check overlap with appointments
-            is_available = True
-            for appt in appointments:
-                # Overlap logic: (StartA < EndB) and (EndA > StartB)
-                if (slot_start < appt.end_datetime) and (slot_end > appt.start_datetime):
-                    is_available = False
-                    break
-
-            slots.append(
-                SlotRead(
-                    tutor_id=tutor_id,
-                    start_datetime=slot_start,
-                    end_datetime=slot_end,
-                    available=is_available,
-                    pattern_id=pattern.id,
-                )
+
+    for slot_start, slot_end, pattern_id in expand_template(template, target_date, tutor_tz):
+        # Check overlap with appointments
+        is_available = True
+        for appt in appointments:
+            # Overlap logic: (StartA < EndB) and (EndA > StartB)
+            if (slot_start < appt.end_datetime) and (slot_end > appt.start_datetime):
+                is_available = False
+                break
+
+        slots.append(
+            SlotRead(
+                tutor_id=tutor_id,
+                start_datetime=slot_start,
+                end_datetime=slot_end,
+                available=is_available,
+                pattern_id=pattern_id,
             )
-            current_time += duration
+        )
 
     return slots
 
@@ -221,6 +216,82 @@ async def get_availability_slots(
     return await calculate_slots(tutor_id, date, session)
 
 
+@router.get("/search", response_model=list[TutorProfileRead])
+async def search_free_tutors(
+    start: datetime,
+    end: datetime | None = None,
+    specialty: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Tutors with an active pattern covering [start, end) and no booking overlapping it.
+
+    Naive datetimes are read as each tutor's local time ("any tutor free Tuesday
+    at 16:00"); aware ones are absolute instants. Without `end`, the window is
+    one session of each tutor's own length.
+    """
+    if end is not None and (end.tzinfo is None) != (start.tzinfo is None):
+        raise HTTPException(status_code=400, detail="start and end must both include a UTC offset or both omit it")
+    if end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+    def resolve(value: datetime):
+        # Returns (absolute instant, tutor-local wall time) as SQL expressions
+        if value.tzinfo is None:
+            local = literal(value, DateTime())
+            return func.timezone(TutorProfile.timezone, local, type_=DateTime(timezone=True)), local
+        instant = literal(value, DateTime(timezone=True))
+        return instant, func.timezone(TutorProfile.timezone, instant, type_=DateTime())
+
+    window_start, local_start = resolve(start)
+    if end is not None:
+        window_end, local_end = resolve(end)
+    else:
+        window_end = window_start + func.make_interval(0, 0, 0, 0, 0, TutorProfile.session_duration_minutes)
+        local_end = func.timezone(TutorProfile.timezone, window_end, type_=DateTime())
+
+    covering_pattern = exists().where(
+        AvailabilityPattern.tutor_id == TutorProfile.user_id,
+        AvailabilityPattern.is_active,
+        # Postgres DOW: 0=Sunday, 6=Saturday
+        AvailabilityPattern.day_of_week == func.extract("dow", local_start),
+        AvailabilityPattern.start_time <= cast(local_start, Time),
+        AvailabilityPattern.end_time >= cast(local_end, Time),
+    )
+    overlapping_appointment = exists().where(
+        Appointment.tutor_id == TutorProfile.user_id,
+        Appointment.status.in_(["pending", "confirmed"]),
+        Appointment.start_datetime < window_end,
+        Appointment.end_datetime > window_start,
+        Appointment.start_datetime > window_start - MAX_APPOINTMENT_DURATION,
+    )
+
+    query = (
+        select(TutorProfile, User.full_name)
+        .join(User, TutorProfile.user_id == User.id)
+        .where(
+            cast(local_start, Date) == cast(local_end, Date),
+            covering_pattern,
+            ~overlapping_appointment,
+        )
+        .order_by(TutorProfile.public_handle)
+        .limit(limit)
+        .offset(offset)
+    )
+    if specialty:
+        query = query.where(TutorProfile.specialty.icontains(specialty, autoescape=True))
+
+    result = await session.execute(query)
+
+    tutors = []
+    for profile, full_name in result.all():
+        response = TutorProfileRead.model_validate(profile)
+        response.full_name = full_name
+        tutors.append(response)
+    return tutors
+
+
 @router.get("/{public_handle}", response_model=TutorProfileRead)
 async def get_tutor_profile(
     public_handle: str, session: AsyncSession = Depends(get_async_session)
@@ -256,8 +327,10 @@ async def create_availability_pattern(
 
     new_pattern = AvailabilityPattern(**pattern_data.model_dump(), tutor_id=user.id)
     session.add(new_pattern)
+    await bump_availability_version(user.id, session)
     await session.commit()
     await session.refresh(new_pattern)
+    await publish_schedule_change(user.id, {new_pattern.day_of_week})
     return new_pattern
 
 @router.get("/{public_handle}/availability", response_model=list[SlotRead] | list[AvailabilityPatternRead])
@@ -283,6 +356,42 @@ async def get_tutor_availability(
     return result.scalars().all()
 
 
+@router.get("/{public_handle}/availability/stream")
+async def stream_tutor_availability(
+    public_handle: str,
+    request: Request,
+    session: AsyncSession = Depends(get_async_session)
+):
+    result_tutor = await session.execute(select(TutorProfile).where(TutorProfile.public_handle == public_handle))
+    tutor = result_tutor.scalar_one_or_none()
+    if not tutor:
+        raise HTTPException(status_code=404, detail="Tutor not found")
+
+    tutor_id = tutor.user_id
+    # Don't hold a pooled connection for the lifetime of the stream
+    await session.close()
+
+    async def event_stream():
+        queue = broker.subscribe(tutor_id)
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            broker.unsubscribe(tutor_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.put("/me/availability/{pattern_id}", response_model=AvailabilityPatternRead)
 async def update_availability_pattern(
     pattern_id: int,
@@ -300,12 +409,15 @@ async def update_availability_pattern(
     if not pattern:
         raise HTTPException(status_code=404, detail="Availability pattern not found")
 
+    affected_days = {pattern.day_of_week}
     update_data = pattern_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(pattern, key, value)
 
+    await bump_availability_version(user.id, session)
     await session.commit()
     await session.refresh(pattern)
+    await publish_schedule_change(user.id, affected_days | {pattern.day_of_week})
     return pattern
 
 @router.delete("/me/availability/{pattern_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -325,5 +437,7 @@ async def delete_availability_pattern(
         raise HTTPException(status_code=404, detail="Availability pattern not found")
 
     await session.delete(pattern)
+    await bump_availability_version(user.id, session)
     await session.commit()
+    await publish_schedule_change(user.id, {pattern.day_of_week})
     return None
@@ -1,12 +1,37 @@
 import uuid
+from functools import cache
+from zoneinfo import available_timezones
 from pydantic import BaseModel, Field, ConfigDict, field_validator
 from datetime import time, datetime
 
+
+@cache
+def supported_timezones() -> frozenset[str]:
+    # Canonical IANA names only. Depending on the system tz database, ZoneInfo
+    # can also load "localtime", "Factory", "posixrules" or "right/..." zones,
+    # which Postgres' timezone() rejects or may not know.
+    return frozenset(
+        name for name in available_timezones()
+        if name not in {"localtime", "Factory", "posixrules"}
+        and not name.startswith(("posix/", "right/"))
+    )
+
+
+def validate_timezone(v: str) -> str:
+    if v not in supported_timezones():
+        raise ValueError(f"Unknown time zone '{v}'")
+    return v
+
 class TutorProfileBase(BaseModel):
     public_handle: str = Field(..., max_length=50, pattern="^[a-z0-9-]+$")
     specialty: str | None = Field(None, max_length=100)
     bio: str | None = None
     session_duration_minutes: int = Field(60, ge=15, le=180)
+    timezone: str = Field("America/Guayaquil", max_length=64, description="IANA time zone, e.g. America/Guayaquil")
+
+    @field_validator('timezone')
+    def check_timezone(cls, v):
+        return validate_timezone(v)
 
 class TutorProfileCreate(TutorProfileBase):
     pass
@@ -16,6 +41,11 @@ class TutorProfileUpdate(BaseModel):
     specialty: str | None = Field(None, max_length=100)
     bio: str | None = None
     session_duration_minutes: int | None = Field(None, ge=15, le=180)
+    timezone: str | None = Field(None, max_length=64)
+
+    @field_validator('timezone')
+    def check_timezone(cls, v):
+        return validate_timezone(v) if v is not None else v
 
 class TutorProfileRead(TutorProfileBase):
     tutor_id: uuid.UUID = Field(..., validation_alias="user_id")
@@ -0,0 +1,112 @@
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, time, timezone
+from typing import Iterable
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tutors.models import TutorProfile, AvailabilityPattern
+
+
+@dataclass(frozen=True)
+class WeeklyTemplate:
+    duration_minutes: int
+    # day_of_week (0=Sunday, 6=Saturday) -> ((start offset in minutes from local midnight, pattern_id), ...)
+    days: dict[int, tuple[tuple[int, int], ...]]
+
+    def available_minutes(self, day_of_week: int) -> int:
+        return len(self.days.get(day_of_week, ())) * self.duration_minutes
+
+
+def _minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def compile_weekly_template(
+    patterns: Iterable[AvailabilityPattern], duration_minutes: int
+) -> WeeklyTemplate:
+    days: dict[int, list[tuple[int, int]]] = {}
+    for pattern in patterns:
+        offset = _minutes(pattern.start_time)
+        pattern_end = _minutes(pattern.end_time)
+        while offset + duration_minutes <= pattern_end:
+            days.setdefault(pattern.day_of_week, []).append((offset, pattern.id))
+            offset += duration_minutes
+
+    return WeeklyTemplate(
+        duration_minutes=duration_minutes,
+        days={day: tuple(sorted(slots)) for day, slots in days.items()},
+    )
+
+
+# tutor_id -> ((availability_version, session_duration_minutes), template)
+_template_cache: dict[uuid.UUID, tuple[tuple[int, int], WeeklyTemplate]] = {}
+
+
+async def get_weekly_template(tutor: TutorProfile, session: AsyncSession) -> WeeklyTemplate:
+    # The version lives on the profile row, so every worker notices pattern edits
+    # without any cross-process invalidation.
+    key = (tutor.availability_version, tutor.session_duration_minutes)
+    cached = _template_cache.get(tutor.user_id)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    result = await session.execute(
+        select(AvailabilityPattern).where(
+            and_(
+                AvailabilityPattern.tutor_id == tutor.user_id,
+                AvailabilityPattern.is_active,
+            )
+        )
+    )
+    template = compile_weekly_template(result.scalars().all(), tutor.session_duration_minutes)
+    _template_cache[tutor.user_id] = (key, template)
+    return template
+
+
+def day_of_week(target_date: date) -> int:
+    # Python: Mon=0, Sun=6. Patterns use 0=Sunday, 6=Saturday.
+    return (target_date.weekday() + 1) % 7
+
+
+def local_instants(wall: datetime, tz: ZoneInfo) -> list[datetime]:
+    """Every real instant at which the naive wall-clock time `wall` occurs in `tz`.
+
+    Empty inside a spring-forward gap; two instants (fold=0 then fold=1) in the
+    hour repeated when clocks fall back.
+    """
+    instants = []
+    for fold in (0, 1):
+        local = wall.replace(tzinfo=tz, fold=fold)
+        # Times skipped by a DST jump don't survive a UTC round trip
+        round_trip = local.astimezone(timezone.utc).astimezone(tz)
+        if round_trip.replace(tzinfo=None) == wall and round_trip.fold == fold:
+            instants.append(local)
+    return instants
+
+
+def add_elapsed(start: datetime, duration: timedelta) -> datetime:
+    # Aware + timedelta is wall-clock arithmetic within one tzinfo; go through
+    # UTC so sessions last `duration` of real time across DST transitions.
+    return (start.astimezone(timezone.utc) + duration).astimezone(start.tzinfo)
+
+
+def expand_template(
+    template: WeeklyTemplate, target_date: date, tz: ZoneInfo
+) -> list[tuple[datetime, datetime, int]]:
+    # Slots start at every real instant matching a template offset: offsets in a
+    # spring-forward gap produce nothing, offsets in a repeated fall-back hour
+    # produce a slot in each occurrence of that hour.
+    midnight = datetime.combine(target_date, time.min)
+    duration = timedelta(minutes=template.duration_minutes)
+
+    slots = []
+    for offset, pattern_id in template.days.get(day_of_week(target_date), ()):
+        for slot_start in local_instants(midnight + timedelta(minutes=offset), tz):
+            slots.append((slot_start, add_elapsed(slot_start, duration), pattern_id))
+
+    # Same-tzinfo comparisons ignore fold, so order by the UTC instant
+    slots.sort(key=lambda slot: slot[0].astimezone(timezone.utc))
+    return slots